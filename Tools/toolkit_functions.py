@@ -23,53 +23,132 @@ def load_st_model():
 
 # --- TOOL 1: TMX CLEANER ---
 
-def clean_tmx_content(tmx_file_buffer, similarity_threshold: float) -> (str, str):
-    """Cleans a TMX file using semantic similarity and removes duplicates."""
-    model = load_st_model() # THIS LINE WAS MISSING AND IS NOW FIXED
+XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+
+def _tuv_lang(tuv) -> str:
+    """Returns the normalized language of a <tuv> (xml:lang, or 'lang' for TMX 1.1)."""
+    return (tuv.get(XML_LANG) or tuv.get("lang") or "").strip().lower()
+
+def _tuv_text(tuv):
+    """Returns the stripped segment text of a <tuv>, or None if it is missing or empty."""
+    seg = tuv.find("seg")
+    if seg is None or seg.text is None or not seg.text.strip():
+        return None
+    return seg.text.strip()
+
+def _find_source_tuv(tuvs, srclang: str):
+    """Finds the source <tuv> by exact srclang, then by primary subtag ('en' matches 'en-US')."""
+    if not srclang:
+        return None
+    exact = next((t for t in tuvs if _tuv_lang(t) == srclang), None)
+    if exact is not None:
+        return exact
+    primary = srclang.split('-')[0]
+    return next((t for t in tuvs if _tuv_lang(t).split('-')[0] == primary), None)
+
+def clean_tmx_tree(root, model, similarity_threshold: float) -> list:
+    """
+    Cleans a parsed TMX tree in place and returns the report lines.
+    Each TU may hold any number of <tuv> variants; the source is picked by the header's
+    srclang (exact, then primary subtag, then the first <tuv>) and every other variant is a target.
+    Every unique text is encoded once, all source/target pairs are scored in a single
+    vectorized pass, and low-similarity target variants are dropped individually.
+    A TU is removed only when it has no usable source or no targets left.
+    """
     report_lines = []
+    body = root.find('body')
+    if body is None:
+        raise ValueError("<body> tag not found in TMX file.")
+
+    header = root.find('header')
+    srclang = (header.get("srclang") or "").strip().lower() if header is not None else ""
+    if srclang == "*all*":
+        srclang = ""
+
+    all_tus = list(body)
+    initial_count = len(all_tus)
+    text_index = {}  # unique text -> row in the embedding matrix
+    guessed_sources = 0  # TUs whose source fell back to the first <tuv>
+    pairs = []  # (tu, target tuv, source text, target text), duplicates included
+
+    for tu in all_tus:
+        tuvs = tu.findall("tuv")
+        source_tuv = _find_source_tuv(tuvs, srclang)
+        if source_tuv is None and tuvs:
+            source_tuv = tuvs[0]
+            guessed_sources += 1
+        source_text = _tuv_text(source_tuv) if source_tuv is not None else None
+        if source_text is None:
+            body.remove(tu)
+            report_lines.append("Removed a TU with a missing source segment.")
+            continue
+
+        tu_pairs = []
+        for tuv in tuvs:
+            if tuv is source_tuv:
+                continue
+            target_text = _tuv_text(tuv)
+            if target_text is None:
+                tu.remove(tuv)
+                report_lines.append(f"Removed an empty '{_tuv_lang(tuv)}' variant for: '{source_text[:50]}...'")
+            else:
+                tu_pairs.append((tu, tuv, source_text, target_text))
+
+        if not tu_pairs:
+            body.remove(tu)
+            report_lines.append(f"Removed a TU with no remaining target variants: '{source_text[:50]}...'")
+            continue
+
+        text_index.setdefault(source_text, len(text_index))
+        for _, _, _, target_text in tu_pairs:
+            text_index.setdefault(target_text, len(text_index))
+        pairs.extend(tu_pairs)
+
+    if guessed_sources:
+        report_lines.append(f"Warning: no '{srclang or 'srclang'}' variant found in {guessed_sources} TUs; the first <tuv> was guessed as the source.")
+
+    # Semantic similarity check: one encode over unique texts, one pairwise scoring pass.
+    # Duplicates are scored too, so the first *aligned* variant per (source, lang) is the one kept.
+    if pairs:
+        embeddings = model.encode(list(text_index), convert_to_tensor=True, show_progress_bar=False)
+        source_rows = [text_index[src] for _, _, src, _ in pairs]
+        target_rows = [text_index[tgt] for _, _, _, tgt in pairs]
+        cosine_scores = util.pairwise_cos_sim(embeddings[source_rows], embeddings[target_rows]).tolist()
+
+        covered = set()  # (source text, lang) pairs already kept
+        removed_variants = 0
+        for (tu, tuv, source_text, _), score in zip(pairs, cosine_scores):
+            lang = _tuv_lang(tuv)
+            if score < similarity_threshold:
+                tu.remove(tuv)
+                removed_variants += 1
+                report_lines.append(f"Removed low similarity '{lang}' variant (Score: {score:.2f}): '{source_text[:50]}...'")
+            elif (source_text, lang) in covered:
+                tu.remove(tuv)
+                report_lines.append(f"Removed duplicate '{lang}' variant: '{source_text[:50]}...'")
+            else:
+                covered.add((source_text, lang))
+
+        for tu in dict.fromkeys(tu for tu, _, _, _ in pairs):
+            if len(tu.findall("tuv")) < 2:
+                body.remove(tu)
+        if removed_variants:
+            report_lines.append(f"Removed {removed_variants} of {len(pairs)} target variants based on low semantic similarity ({len(text_index)} unique texts encoded).")
+
+    final_count = len(body.findall('tu'))
+    report_lines.insert(0, f"Processing complete. Original TUs: {initial_count}, Final TUs: {final_count}, Removed: {initial_count - final_count}")
+    return report_lines
+
+def clean_tmx_content(tmx_file_buffer, similarity_threshold: float) -> (str, str):
+    """Cleans a (multilingual) TMX file using semantic similarity and removes duplicates."""
+    model = load_st_model()
     try:
         tree = ET.parse(tmx_file_buffer)
         root = tree.getroot()
-        body = root.find('body')
-        if body is None:
+        if root.find('body') is None:
             return "<!-- Error: <body> tag not found -->", "Error: <body> tag not found in TMX file."
 
-        all_tus = list(body)
-        initial_count = len(all_tus)
-        unique_sources = {}
-        segments_to_process = []
-        
-        for tu in all_tus:
-            source_seg = tu.find("./tuv[1]/seg")
-            if source_seg is not None and source_seg.text is not None:
-                source_text = source_seg.text.strip()
-                if source_text in unique_sources:
-                    body.remove(tu)
-                    report_lines.append(f"Removed duplicate: '{source_text[:50]}...'")
-                else:
-                    unique_sources[source_text] = True
-                    segments_to_process.append(tu)
-            else:
-                body.remove(tu)
-                report_lines.append("Removed a TU with a missing source segment.")
-        
-        if segments_to_process:
-            source_texts = [tu.find("./tuv[1]/seg").text.strip() for tu in segments_to_process]
-            target_texts = [tu.find("./tuv[2]/seg").text.strip() for tu in segments_to_process]
-            
-            if source_texts and target_texts and len(source_texts) == len(target_texts):
-                source_embeddings = model.encode(source_texts, convert_to_tensor=True, show_progress_bar=False)
-                target_embeddings = model.encode(target_texts, convert_to_tensor=True, show_progress_bar=False)
-                cosine_scores = util.cos_sim(source_embeddings, target_embeddings).diagonal()
-                indices_to_remove = {i for i, score in enumerate(cosine_scores) if score.item() < similarity_threshold}
-                
-                if indices_to_remove:
-                    final_segments = [seg for i, seg in enumerate(segments_to_process) if i not in indices_to_remove]
-                    report_lines.append(f"Removed {len(indices_to_remove)} segments based on low semantic similarity.")
-                    body.clear(); body.extend(final_segments)
-        
-        final_count = len(body.findall('tu'))
-        report_lines.insert(0, f"Processing complete. Original TUs: {initial_count}, Final TUs: {final_count}, Removed: {initial_count - final_count}")
+        report_lines = clean_tmx_tree(root, model, similarity_threshold)
         return ET.tostring(root, encoding='unicode'), "\n".join(report_lines)
 
     except Exception as e:
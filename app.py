@@ -49,7 +49,7 @@ if tool_selection == "--- Select a Tool ---":
 # --- 1. TMX Cleaner Tool ---
 elif tool_selection == "TMX Cleaner (Semantic)":
     st.header("TMX Cleaner with Semantic Analysis")
-    st.write("Cleans duplicate and semantically misaligned translation units from a .tmx file.")
+    st.write("Cleans duplicate and semantically misaligned translation units from a .tmx file. Multilingual TMX files are supported: misaligned target languages are removed individually.")
     
     similarity_threshold = st.slider("Similarity Threshold", 0.1, 1.0, 0.6, 0.05, help="Segments with a similarity score below this value will be removed.")
     uploaded_file = st.file_uploader("Upload your .tmx file", type=["tmx"], key="tmx_uploader")